@@ -2,18 +2,28 @@ import tkinter as tk
 from tkinter import scrolledtext, filedialog, messagebox
 
 import re
-import requests
+import sys
 import webbrowser
 import json
-
-from tavily import TavilyClient
-
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.units import inch
+import os
+import gzip
+import atexit
+import shutil
+import tempfile
+import argparse
+import threading
+import subprocess
+import random
+import sqlite3
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+# requests, tavily et reportlab sont importés à la première utilisation :
+# l'import du module et l'ouverture de la fenêtre restent rapides.
 
 # ==============================
 # CONFIGURATION GÉNÉRALE
@@ -23,16 +33,68 @@ CLES_TAVILY = "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"
 CLES_MISTRAL = "SxPUgCYNxcS0a0jFsEzaOq3Opqc8CFth"
 URL_API_MISTRAL = "https://api.mistral.ai/v1/chat/completions"
 
-client_tavily = TavilyClient(api_key=CLES_TAVILY)
+# Niveaux de modèles Mistral. Les affirmations faciles (sources de confiance
+# nombreuses et concordantes) vont au petit modèle, avec une réponse
+# plafonnée ; les autres au grand modèle si le budget de latence le permet.
+# Le niveau de secours remplace le niveau choisi quand celui-ci expire.
+# Seule la latence est budgétée : le coût d'un appel est borné par son
+# max_tokens, y compris pour le grand modèle.
+NIVEAUX_MISTRAL = {
+    "petit": {"modele": "mistral-small-latest", "max_tokens": 800, "delai": 20, "latence_estimee": 5},
+    "grand": {"modele": "mistral-large-latest", "max_tokens": 1500, "delai": 60, "latence_estimee": 15},
+    "secours": {"modele": "ministral-8b-latest", "max_tokens": 800, "delai": 15, "latence_estimee": 3},
+}
+BUDGET_LATENCE_SECONDES = 45
+DELAI_MINIMUM_SECONDES = 5
+# Au-delà de ce taux d'expiration (mesuré après NB_APPELS_MIN_EXPIRATION
+# appels), le grand modèle n'est plus choisi pendant la session.
+TAUX_EXPIRATION_MAX = 0.3
+NB_APPELS_MIN_EXPIRATION = 5
+# Codes HTTP (limite de débit, panne serveur) qui font passer au secours
+CODES_HTTP_SECOURS = {429, 500, 502, 503, 504}
+SEUIL_ACCORD_FACILE = 60
+NB_SOURCES_FIABLES_FACILE = 2
+
+# Créé à la première recherche (voir obtenir_client_tavily)
+client_tavily = None
+
+# Modules lourds qui ne doivent pas être chargés à l'import (voir
+# mesurer_temps_import)
+MODULES_CHARGES_A_LA_DEMANDE = ["requests", "tavily", "reportlab", "multiprocessing"]
 
 DOMAINES_FIABLES = [
     "linkedin.com", "wikipedia.org", "gouv.fr", "gov", "edu", "univ", "cnrs.fr"
 ]
 
+# Historique des questions : au-delà de cette limite, les entrées les plus
+# anciennes sont compressées sur disque et rechargées à la demande.
+HISTORIQUE_MAX_EN_MEMOIRE = 10
+
+# Si True, Mistral doit répondre en JSON (response_format), ce qui donne des
+# champs typés ; une réponse invalide déclenche une nouvelle demande en texte.
+UTILISER_FORMAT_JSON = False
+
+# Vérification par lot : deux affirmations sont regroupées (et vérifiées
+# une seule fois) si la similarité de Jaccard de leurs mots normalisés
+# atteint ce seuil et que les mots de l'une sont tous dans l'autre (voir
+# regrouper_affirmations).
+SEUIL_SIMILARITE_LOT = 0.75
+
+# Vérification par lot : appels réseau simultanés (fils) et processus pour
+# le post-traitement (lecture des réponses, fiabilité des sources, PDF).
+NB_REQUETES_SIMULTANEES = 4
+NB_PROCESSUS_LOT = os.cpu_count() or 1
+
+# Registre SQLite de toutes les vérifications ; les écritures sont groupées
+# par transactions de TAILLE_LOT_REGISTRE lignes au plus.
+CHEMIN_REGISTRE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "verifications.db")
+TAILLE_LOT_REGISTRE = 200
+
 # Références globales sur l'interface principale
 application = None
 zone_sortie = None
 champ_question = None
+liste_historique = None
 
 # ==============================
 # FONCTIONS UTILITAIRES
@@ -87,6 +149,8 @@ def est_url_de_confiance(url):
 def est_url_accessible(url):
     """Teste rapidement si l'URL répond avec un code 200."""
     try:
+        import requests
+
         reponse = requests.head(url, timeout=5, allow_redirects=True, verify=True)
         return reponse.status_code == 200
     except Exception:
@@ -96,13 +160,22 @@ def est_url_accessible(url):
 # 1. RECHERCHE INTERNET (TAVILY)
 # ==============================
 
+def obtenir_client_tavily():
+    """Crée le client Tavily au premier appel, puis le réutilise."""
+    global client_tavily
+    if client_tavily is None:
+        from tavily import TavilyClient
+        client_tavily = TavilyClient(api_key=CLES_TAVILY)
+    return client_tavily
+
+
 def rechercher_sur_internet(requete):
     """
     Envoie une requête de recherche à Tavily et retourne la liste
     des résultats structurés.
     """
     try:
-        resultats = client_tavily.search(
+        resultats = obtenir_client_tavily().search(
             query=requete,
             max_results=5,
             include_domains=None
@@ -115,12 +188,45 @@ def rechercher_sur_internet(requete):
 # 2. ANALYSE IA (MISTRAL)
 # ==============================
 
-def demander_analyse_mistral(question):
+CONSIGNE_FORMAT_JSON = """
+Réponds UNIQUEMENT avec un objet JSON valide, sans texte autour, de la forme :
+{
+  "resume": "résumé général",
+  "analyse": "analyse des faits",
+  "confirme": ["ce qui est confirmé", "..."],
+  "infirme": ["ce qui est infirmé", "..."],
+  "sources": ["https://...", "..."],
+  "conclusion": "VRAI" ou "FAUX"
+}
+"""
+
+
+def demander_analyse_mistral(question, format_json=False, mesures=None, budget=None,
+                             resultats_web=None, echeance=None):
     """
     Envoie la question et les résultats web à l'API Mistral pour obtenir
     une analyse structurée, avec une conclusion explicite VRAI ou FAUX.
+    Avec `format_json=True`, la réponse demandée est un objet JSON
+    (voir CONSIGNE_FORMAT_JSON). Si `mesures` est un dictionnaire, les durées
+    de recherche et d'analyse (en secondes), le modèle, le niveau et l'accord
+    des sources y sont ajoutés.
+
+    Le modèle est choisi par choisir_niveau selon l'accord des sources et
+    le budget de latence (BUDGET_LATENCE_SECONDES par défaut), recherche
+    comprise. Pour refaire seulement l'appel à Mistral, `resultats_web`
+    reprend une recherche déjà faite et `echeance` (en temps
+    time.perf_counter) la fin du budget déjà entamé.
     """
-    resultats_web = rechercher_sur_internet(question)
+    debut = time.perf_counter()
+    if resultats_web is None:
+        resultats_web = rechercher_sur_internet(question)
+    fin_recherche = time.perf_counter()
+
+    if echeance is None:
+        budget = BUDGET_LATENCE_SECONDES if budget is None else budget
+        echeance = debut + budget
+    accord, nb_fiables = evaluer_accord_sources(resultats_web)
+    niveau = choisir_niveau(accord, nb_fiables, echeance - fin_recherche)
 
     en_tetes = {
         "Authorization": f"Bearer {CLES_MISTRAL}",
@@ -128,7 +234,6 @@ def demander_analyse_mistral(question):
     }
 
     donnees = {
-        "model": "mistral-small-latest",
         "messages": [
             {
                 "role": "system",
@@ -149,7 +254,8 @@ Conclusion : FAUX
 Structure la réponse en sections claires avec des emojis :
 - 📋 Résumé général
 - 🔍 Analyse des faits
-- ✅ Ce qui est confirmé / ❌ Ce qui est infirmé
+- ✅ Ce qui est confirmé
+- ❌ Ce qui est infirmé
 - 🔗 Sources vérifiées
 
 Utilise des emojis pour rendre la lecture plus agréable.
@@ -169,18 +275,1091 @@ Analyse ces informations et répond de façon rigoureuse.
         ],
     }
 
+    if format_json:
+        donnees["messages"][0]["content"] += CONSIGNE_FORMAT_JSON
+        donnees["response_format"] = {"type": "json_object"}
+
     try:
-        reponse = requests.post(URL_API_MISTRAL, json=donnees, headers=en_tetes)
-        resultat = reponse.json()
-        return resultat["choices"][0]["message"]["content"]
+        import requests
+
+        try:
+            return appeler_niveau_mistral(niveau, donnees, en_tetes, echeance, accord)
+        except (requests.Timeout, requests.HTTPError):
+            niveau = "secours"
+            return appeler_niveau_mistral(niveau, donnees, en_tetes, echeance, accord)
     except Exception as e:
         return f"❌ Erreur API : {e}"
+    finally:
+        if mesures is not None:
+            fin = time.perf_counter()
+            mesures["modele"] = NIVEAUX_MISTRAL[niveau]["modele"]
+            mesures["niveau"] = niveau
+            mesures["accord"] = accord
+            mesures["duree_recherche"] = mesures.get("duree_recherche", 0.0) + fin_recherche - debut
+            mesures["duree_analyse"] = mesures.get("duree_analyse", 0.0) + fin - fin_recherche
+
+def est_erreur_api(reponse):
+    """Vrai si `reponse` est le message d'erreur renvoyé par demander_analyse_mistral."""
+    return reponse.startswith("❌ Erreur API")
+
+# ==============================
+# ROUTAGE ENTRE LES MODÈLES MISTRAL
+# ==============================
+
+# Statistiques par niveau, pour régler SEUIL_ACCORD_FACILE et les délais
+# (latence_totale ne compte que les appels réussis)
+statistiques_niveaux = {
+    nom: {"appels": 0, "reussites": 0, "expirations": 0, "echecs": 0,
+          "latence_totale": 0.0, "accord_total": 0,
+          "conclusions": {"VRAI": 0, "FAUX": 0, "illisible": 0}}
+    for nom in NIVEAUX_MISTRAL
+}
+verrou_statistiques = threading.Lock()
+
+
+def evaluer_accord_sources(resultats_web):
+    """
+    Renvoie (accord, nb_fiables) pour les résultats Tavily : accord est la
+    part en % des résultats venant de domaines de confiance, pondérée par
+    leur pertinence (champ "score" de Tavily).
+    """
+    poids_total = 0.0
+    poids_fiables = 0.0
+    nb_fiables = 0
+    for resultat in resultats_web:
+        url = resultat.get("url")
+        if not url:
+            continue
+        poids = resultat.get("score") or 1.0
+        poids_total += poids
+        if est_url_valide(url) and est_url_de_confiance(url):
+            poids_fiables += poids
+            nb_fiables += 1
+
+    if poids_total == 0:
+        return 0, 0
+    return round(100 * poids_fiables / poids_total), nb_fiables
+
+
+def latence_attendue(nom_niveau):
+    """
+    Durée attendue d'un appel à un niveau : moyenne des appels réussis et
+    des expirations, chaque expiration comptant pour le délai complet du
+    niveau. Un modèle qui expire souvent finit ainsi par ne plus tenir dans
+    le budget. Avant le premier appel, renvoie son estimation.
+    """
+    delai = NIVEAUX_MISTRAL[nom_niveau]["delai"]
+    with verrou_statistiques:
+        statistiques = statistiques_niveaux[nom_niveau]
+        nb_appels = statistiques["reussites"] + statistiques["expirations"]
+        if nb_appels:
+            return (statistiques["latence_totale"] + statistiques["expirations"] * delai) / nb_appels
+    return NIVEAUX_MISTRAL[nom_niveau]["latence_estimee"]
+
+
+def reserve_secours():
+    """
+    Temps gardé en fin de budget pour le niveau de secours : sa latence
+    attendue, et au moins le délai minimum qui lui sera accordé.
+    """
+    return max(latence_attendue("secours"), DELAI_MINIMUM_SECONDES)
+
+
+def choisir_niveau(accord, nb_fiables, temps_restant):
+    """
+    Choisit le niveau de modèle : "petit" pour une affirmation facile, quand
+    le grand modèle expire trop souvent ou quand le budget restant, moins la
+    réserve du secours, ne suffit pas à sa latence attendue, "grand" sinon.
+    """
+    if nb_fiables >= NB_SOURCES_FIABLES_FACILE and accord >= SEUIL_ACCORD_FACILE:
+        return "petit"
+    with verrou_statistiques:
+        appels = statistiques_niveaux["grand"]["appels"]
+        expirations = statistiques_niveaux["grand"]["expirations"]
+    if appels >= NB_APPELS_MIN_EXPIRATION and expirations / appels > TAUX_EXPIRATION_MAX:
+        return "petit"
+    if latence_attendue("grand") <= temps_restant - reserve_secours():
+        return "grand"
+    return "petit"
+
+
+def appeler_niveau_mistral(nom_niveau, donnees, en_tetes, echeance, accord):
+    """
+    Appelle Mistral avec le modèle du niveau donné, dans la limite de son
+    délai et du temps restant avant `echeance` (au moins
+    DELAI_MINIMUM_SECONDES). Hors secours, la réserve du secours est
+    retirée du temps restant, pour qu'il puisse encore répondre dans le
+    budget. Lève requests.Timeout si le délai expire, requests.HTTPError
+    pour un code de CODES_HTTP_SECOURS et ValueError pour toute autre
+    réponse sans contenu.
+    """
+    import requests
+
+    niveau = NIVEAUX_MISTRAL[nom_niveau]
+    donnees = dict(donnees, model=niveau["modele"])
+    if niveau["max_tokens"]:
+        donnees["max_tokens"] = niveau["max_tokens"]
+    reserve = 0 if nom_niveau == "secours" else reserve_secours()
+    temps_restant = echeance - reserve - time.perf_counter()
+    delai = max(DELAI_MINIMUM_SECONDES, min(niveau["delai"], temps_restant))
+
+    debut = time.perf_counter()
+    try:
+        reponse = requests.post(URL_API_MISTRAL, json=donnees, headers=en_tetes, timeout=delai)
+    except requests.Timeout:
+        noter_appel_niveau(nom_niveau, time.perf_counter() - debut, accord, "expirations")
+        raise
+    latence = time.perf_counter() - debut
+
+    if reponse.status_code in CODES_HTTP_SECOURS:
+        noter_appel_niveau(nom_niveau, latence, accord, "echecs")
+        raise requests.HTTPError(f"HTTP {reponse.status_code} ({niveau['modele']})", response=reponse)
+
+    try:
+        contenu = reponse.json()["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        noter_appel_niveau(nom_niveau, latence, accord, "echecs")
+        raise ValueError(f"réponse inattendue (HTTP {reponse.status_code}) : {reponse.text[:200]}")
+
+    noter_appel_niveau(nom_niveau, latence, accord, "reussites")
+    return contenu
+
+
+def noter_appel_niveau(nom_niveau, latence, accord, issue):
+    """Compte un appel ; `issue` vaut "reussites", "expirations" ou "echecs"."""
+    with verrou_statistiques:
+        statistiques = statistiques_niveaux[nom_niveau]
+        statistiques["appels"] += 1
+        statistiques[issue] += 1
+        statistiques["accord_total"] += accord
+        if issue == "reussites":
+            statistiques["latence_totale"] += latence
+
+
+def noter_conclusion_niveau(nom_niveau, conclusion):
+    """Compte les conclusions lisibles ou non obtenues par chaque niveau."""
+    if nom_niveau not in statistiques_niveaux:
+        return
+    with verrou_statistiques:
+        statistiques_niveaux[nom_niveau]["conclusions"][conclusion or "illisible"] += 1
+
+
+def resumer_statistiques_niveaux():
+    """
+    Renvoie, par niveau utilisé : appels, latence moyenne des réussites,
+    accord moyen, taux d'expiration et d'échec (HTTP 429/5xx, réponse
+    invalide), conclusions.
+    """
+    resume = {}
+    with verrou_statistiques:
+        for nom, statistiques in statistiques_niveaux.items():
+            appels = statistiques["appels"]
+            if not appels:
+                continue
+            reussites = statistiques["reussites"]
+            resume[nom] = {
+                "modele": NIVEAUX_MISTRAL[nom]["modele"],
+                "appels": appels,
+                "latence_moyenne": round(statistiques["latence_totale"] / reussites, 2) if reussites else None,
+                "taux_expiration": round(statistiques["expirations"] / appels, 3),
+                "taux_echec": round(statistiques["echecs"] / appels, 3),
+                "accord_moyen": round(statistiques["accord_total"] / appels, 1),
+                "conclusions": dict(statistiques["conclusions"]),
+            }
+    return resume
+
+# ==============================
+# 3. LECTURE DE LA RÉPONSE STRUCTURÉE
+# ==============================
+
+# (clé, emoji, mot-clé du titre, titre affiché)
+SECTIONS_REPONSE = [
+    ("resume", "📋", "résumé", "Résumé général"),
+    ("analyse", "🔍", "analyse", "Analyse des faits"),
+    ("confirme", "✅", "confirm", "Ce qui est confirmé"),
+    ("infirme", "❌", "infirm", "Ce qui est infirmé"),
+    ("sources", "🔗", "source", "Sources vérifiées"),
+]
+
+MOTIF_CONCLUSION = re.compile(r'^conclusion[^:\n]{0,20}:\s*(.*)$', re.IGNORECASE)
+MOTIF_VERDICT = re.compile(r'\b(VRAI|FAUX)\b')
+MOTIF_URL_SOURCE = re.compile(r'https?://[^\s<>"\]\)]+')
+
+
+def lire_verdict(texte):
+    """
+    Renvoie "VRAI" ou "FAUX" si le texte en contient exactement un des deux,
+    None sinon (absent ou ambigu, ex : "VRAI ou FAUX").
+    """
+    verdicts = set(MOTIF_VERDICT.findall(texte.upper()))
+    if len(verdicts) == 1:
+        return verdicts.pop()
+    return None
+
+
+def retirer_marqueurs_debut(ligne):
+    """
+    Retire du début de la ligne la mise en forme, les emojis et les marqueurs
+    de liste (« - », « • », « 1. ») : « 📌 **Conclusion** » -> « Conclusion** ».
+    """
+    for position, caractere in enumerate(ligne):
+        if caractere.isspace() or caractere.isdigit() or caractere in "#*>_-•·–—.)":
+            continue
+        if unicodedata.category(caractere) in ("So", "Sk", "Mn", "Cf", "Cs"):
+            continue
+        return ligne[position:]
+    return ""
+
+
+def detecter_section(ligne, ligne_nettoyee):
+    """
+    Renvoie la clé de section si la ligne est un titre de section, sinon None.
+    Une ligne commençant par un emoji n'est un titre que si elle est mise en
+    forme comme tel (#, gras, « : » final) ou reprend le titre attendu : une
+    puce « ✅ Les sources confirment ... » reste du contenu.
+    """
+    if len(ligne_nettoyee) > 80:
+        return None
+    brute = ligne.strip()
+    en_forme_de_titre = (
+        brute.startswith("#")
+        or (brute.startswith("**") and brute.endswith("**"))
+        or brute.endswith(":")
+    )
+    minuscules = ligne_nettoyee.lower()
+    for cle, emoji, mot_cle, titre in SECTIONS_REPONSE:
+        if not ligne_nettoyee.startswith(emoji) or mot_cle not in minuscules:
+            continue
+        if en_forme_de_titre or titre.lower() in minuscules:
+            if cle == "confirme" and "❌" in ligne_nettoyee and "infirm" in minuscules:
+                # Ancien titre commun « ✅ Ce qui est confirmé / ❌ Ce qui est infirmé »
+                return "confirme_infirme"
+            return cle
+    return None
+
+
+def analyser_reponse_structuree(texte):
+    """
+    Parcourt une seule fois la réponse de Mistral et renvoie un dictionnaire :
+    - "sections" : texte de chaque section (clés de SECTIONS_REPONSE)
+    - "conclusion" : "VRAI", "FAUX" ou None si absente ou ambiguë
+    - "conclusion_trouvee" : True si une ligne "Conclusion : ..." existe
+    - "urls" : URLs citées, dans l'ordre, sans doublons
+    - "corps" : la réponse sans ses lignes de conclusion
+    """
+    sections = {cle: [] for cle, _emoji, _mot_cle, _titre in SECTIONS_REPONSE}
+    section_courante = None
+    # Sous un titre commun confirmé / infirmé, chaque puce ✅ ou ❌ indique
+    # la section de ce qui suit.
+    section_mixte = False
+    conclusion = None
+    conclusion_trouvee = False
+    attente_verdict = False
+    urls = []
+    urls_vues = set()
+    corps = []
+
+    for ligne in texte.split("\n"):
+        nettoyee = ligne.strip().strip("#*>_ ").strip()
+        sans_marqueurs = retirer_marqueurs_debut(nettoyee)
+
+        if attente_verdict and nettoyee:
+            # Verdict seul sur la ligne qui suit un titre « Conclusion ».
+            attente_verdict = False
+            verdict = lire_verdict(nettoyee) if len(nettoyee) <= 20 else None
+            if verdict:
+                conclusion = verdict
+                conclusion_trouvee = True
+                continue
+
+        if sans_marqueurs.lower().rstrip(" :*_") == "conclusion":
+            attente_verdict = True
+            section_courante = None
+            continue
+
+        correspondance = MOTIF_CONCLUSION.match(sans_marqueurs)
+        if correspondance:
+            # La dernière ligne de conclusion l'emporte, comme auparavant.
+            conclusion_trouvee = True
+            conclusion = lire_verdict(correspondance.group(1))
+            attente_verdict = not correspondance.group(1).strip("*_ ")
+            section_courante = None
+            continue
+
+        corps.append(ligne)
+
+        for url in MOTIF_URL_SOURCE.findall(ligne):
+            url = url.rstrip(".,;:*")
+            if url not in urls_vues:
+                urls_vues.add(url)
+                urls.append(url)
+
+        cle = detecter_section(ligne, nettoyee)
+        if cle == "confirme_infirme":
+            section_courante = "confirme"
+            section_mixte = True
+            continue
+        if cle and cle != section_courante:
+            section_courante = cle
+            section_mixte = False
+            continue
+
+        if section_mixte:
+            puce = nettoyee.lstrip("-•* ")
+            if puce.startswith("❌"):
+                section_courante = "infirme"
+            elif puce.startswith("✅"):
+                section_courante = "confirme"
+
+        if section_courante:
+            sections[section_courante].append(ligne)
+
+    return {
+        "sections": {cle: "\n".join(l).strip() for cle, l in sections.items()},
+        "conclusion": conclusion,
+        "conclusion_trouvee": conclusion_trouvee,
+        "urls": urls,
+        "corps": "\n".join(corps).strip(),
+    }
+
+
+def valider_reponse_json(contenu):
+    """
+    Vérifie une réponse demandée au format JSON et la convertit dans la même
+    forme que analyser_reponse_structuree. Renvoie None si elle est invalide.
+    """
+    try:
+        donnees = json.loads(contenu)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(donnees, dict):
+        return None
+
+    conclusion = lire_verdict(str(donnees.get("conclusion", "")))
+    if conclusion is None:
+        return None
+
+    sections = {}
+    for cle, _emoji, _mot_cle, _titre in SECTIONS_REPONSE:
+        valeur = donnees.get(cle, "")
+        if isinstance(valeur, str):
+            valeur = [valeur] if valeur.strip() else []
+        if not isinstance(valeur, list) or not all(isinstance(v, str) for v in valeur):
+            return None
+        if cle in ("resume", "analyse"):
+            sections[cle] = "\n".join(valeur).strip()
+        else:
+            sections[cle] = "\n".join(f"- {v.strip()}" for v in valeur)
+
+    urls = []
+    for source in donnees.get("sources") or []:
+        for url in MOTIF_URL_SOURCE.findall(source):
+            url = url.rstrip(".,;:*")
+            if url not in urls:
+                urls.append(url)
+
+    analyse = {
+        "sections": sections,
+        "conclusion": conclusion,
+        "conclusion_trouvee": True,
+        "urls": urls,
+    }
+    analyse["corps"] = reponse_structuree_vers_texte(analyse, avec_conclusion=False)
+    return analyse
+
+
+def reponse_structuree_vers_texte(analyse, avec_conclusion=True):
+    """Reconstruit le texte affiché (sections avec emojis) à partir d'une analyse."""
+    blocs = []
+    for cle, emoji, _mot_cle, titre in SECTIONS_REPONSE:
+        if analyse["sections"].get(cle):
+            blocs.append(f"## {emoji} {titre}\n{analyse['sections'][cle]}")
+    texte = "\n\n".join(blocs)
+    if avec_conclusion:
+        texte += f"\n\nConclusion : {analyse['conclusion'] or 'FAUX'}"
+    return texte
+
+
+def demander_reponse_brute(question, mesures=None):
+    """
+    Partie réseau de analyser_question : renvoie (réponse brute, format_json),
+    où format_json indique une réponse JSON déjà validée.
+    """
+    if not UTILISER_FORMAT_JSON:
+        return demander_analyse_mistral(question, mesures=mesures), False
+
+    # Si le JSON est invalide, seule la demande à Mistral est refaite : même
+    # recherche Tavily, même budget de latence.
+    debut = time.perf_counter()
+    resultats_web = rechercher_sur_internet(question)
+    echeance = debut + BUDGET_LATENCE_SECONDES
+    if mesures is not None:
+        mesures["duree_recherche"] = mesures.get("duree_recherche", 0.0) + time.perf_counter() - debut
+
+    reponse = demander_analyse_mistral(
+        question, format_json=True, mesures=mesures,
+        resultats_web=resultats_web, echeance=echeance,
+    )
+    if valider_reponse_json(reponse) is not None:
+        return reponse, True
+    reponse = demander_analyse_mistral(
+        question, mesures=mesures, resultats_web=resultats_web, echeance=echeance,
+    )
+    return reponse, False
+
+
+def mettre_en_forme_reponse(reponse, format_json=False):
+    """
+    Partie calcul de analyser_question : renvoie (texte à afficher, analyse)
+    à partir de la réponse brute de Mistral, sans accès réseau.
+    """
+    if format_json:
+        analyse = valider_reponse_json(reponse)
+        return reponse_structuree_vers_texte(analyse), analyse
+
+    analyse = analyser_reponse_structuree(reponse)
+
+    if analyse["conclusion_trouvee"]:
+        # Sans verdict lisible, on conserve le comportement historique : FAUX.
+        conclusion = analyse["conclusion"] or "FAUX"
+        reponse = analyse["corps"] + "\n" + f"Conclusion : {conclusion}"
+
+    return reponse, analyse
+
+
+def analyser_question(question, mesures=None):
+    """
+    Interroge Mistral et renvoie le couple (texte à afficher, analyse).
+    Le texte se termine toujours par "Conclusion : VRAI" ou "Conclusion : FAUX"
+    dès que Mistral a donné une conclusion.
+    """
+    return mettre_en_forme_reponse(*demander_reponse_brute(question, mesures))
+
+# ==============================
+# 4. VÉRIFICATION PAR LOT (REGROUPEMENT DES PARAPHRASES)
+# ==============================
+
+MINHASH_NB_BANDES = 16
+MINHASH_LIGNES_PAR_BANDE = 4
+MINHASH_PREMIER = (1 << 61) - 1
+
+# Paramètres fixes des fonctions de hachage (a * x + b) mod p, identiques
+# d'une exécution à l'autre.
+_generateur_minhash = random.Random(2024)
+MINHASH_PARAMETRES = [
+    (_generateur_minhash.randrange(1, MINHASH_PREMIER), _generateur_minhash.randrange(MINHASH_PREMIER))
+    for _ in range(MINHASH_NB_BANDES * MINHASH_LIGNES_PAR_BANDE)
+]
+
+PREFIXES_QUESTION = [
+    "est-ce que", "est ce que", "est-il vrai que", "est il vrai que",
+    "peut-on dire que", "peut on dire que",
+]
+MOTS_VIDES = {
+    "le", "la", "les", "l", "un", "une", "des", "de", "du", "d",
+    "a", "au", "aux", "en", "que", "qu", "il", "elle", "ils", "elles",
+    "c", "ce", "cet", "cette", "se", "s", "y", "bien", "vraiment",
+    "est", "sont", "ete", "etait", "etaient", "ont", "avait", "avaient",
+}
+MOTS_NEGATION = {"ne", "n", "pas", "jamais", "aucun", "aucune", "non", "plus", "rien"}
+# Mots qui changent le fait affirmé s'ils sont ajoutés : comme les négations
+# et les nombres, ils doivent être identiques des deux côtés.
+MOTS_NUANCE = {
+    "presque", "environ", "près", "moins", "seulement", "uniquement", "quasi",
+    "quasiment", "ancien", "ancienne", "ex", "futur", "future", "premier",
+    "première", "dernier", "dernière", "seul", "seule", "et", "ou", "mais", "sauf",
+}
+# Formes ramenées à une même écriture avant comparaison (sans accents)
+SYNONYMES = {
+    "m": "metre", "km": "kilometre", "cm": "centimetre", "kg": "kilogramme",
+    "g": "gramme", "t": "tonne", "h": "heure", "min": "minute",
+    "obtenu": "recu", "remporte": "recu", "decroche": "recu",
+}
+
+
+def raciner(mot):
+    """Racinisation légère : « mètres » -> « metr », « présidente » -> « president »."""
+    if len(mot) > 3 and mot[-1] in "sx":
+        mot = mot[:-1]
+    if len(mot) > 3 and mot.endswith("e"):
+        mot = mot[:-1]
+    return mot
+
+
+def normaliser_affirmation(texte):
+    """
+    Met une affirmation sous forme comparable : minuscules, sans accents,
+    sans formule de question, sans ponctuation ni mots vides, synonymes
+    ramenés à une même forme et mots racinisés.
+    Renvoie (texte normalisé, marqueurs) où les marqueurs (négations,
+    nombres et MOTS_NUANCE) doivent être identiques pour que deux
+    affirmations soient regroupées : « X est mort » et « X n'est pas mort »,
+    ou « X mesure 330 m » et « X mesure presque 330 m », ne se confondent pas.
+    """
+    texte = unicodedata.normalize("NFC", texte.strip().lower())
+    for prefixe in PREFIXES_QUESTION:
+        if texte.startswith(prefixe):
+            texte = texte[len(prefixe):]
+            break
+
+    # Les négations sont repérées avant de retirer les accents : « né »
+    # deviendrait « ne ».
+    mots = re.findall(r"[^\W_]+", texte)
+    marqueurs = frozenset(
+        m for m in mots if m in MOTS_NEGATION or m in MOTS_NUANCE or m.isdigit()
+    )
+
+    mots_normalises = []
+    for mot in mots:
+        if mot in MOTS_NEGATION or mot in MOTS_NUANCE or mot.isdigit():
+            continue
+        mot = unicodedata.normalize("NFKD", mot)
+        mot = "".join(c for c in mot if not unicodedata.combining(c))
+        if mot not in MOTS_VIDES:
+            mots_normalises.append(raciner(SYNONYMES.get(mot, mot)))
+    return " ".join(mots_normalises), marqueurs
+
+
+def signature_minhash(texte_normalise):
+    """Calcule la signature MinHash de l'ensemble des mots du texte normalisé."""
+    mots = set(texte_normalise.split()) or {""}
+    empreintes = [zlib.crc32(m.encode("utf-8")) for m in mots]
+    return tuple(
+        min((a * x + b) % MINHASH_PREMIER for x in empreintes)
+        for a, b in MINHASH_PARAMETRES
+    )
+
+
+def empreinte_affirmation(enregistrement):
+    """
+    Étape exécutable dans un processus du lot.
+    Entrée : l'affirmation en JSON.
+    Sortie : JSON {"mots", "signature", "marqueurs"}.
+    """
+    texte, marqueurs = normaliser_affirmation(json.loads(enregistrement))
+    return json.dumps({
+        "mots": sorted(set(texte.split())),
+        "signature": signature_minhash(texte),
+        "marqueurs": sorted(marqueurs),
+    })
+
+
+def similarite_paraphrase(mots_a, mots_b):
+    """
+    Similarité de Jaccard de deux ensembles de mots normalisés, ou 0 si
+    chacun a un mot que l'autre n'a pas : un mot remplacé (« réélu » /
+    « battu », « physique » / « chimie ») change le fait affirmé, alors
+    qu'un ordre différent ou un mot en plus (« bien ») ne le change pas.
+    """
+    if not (mots_a <= mots_b or mots_b <= mots_a):
+        return 0.0
+    union = mots_a | mots_b
+    return len(mots_a & mots_b) / len(union) if union else 1.0
+
+
+def regrouper_affirmations(affirmations, seuil=None, nb_processus=1):
+    """
+    Regroupe les paraphrases d'une liste d'affirmations.
+    Les signatures MinHash sont réparties en bandes (LSH) : une affirmation
+    n'est comparée qu'aux représentants qui partagent une de ses bandes, ce
+    qui évite les comparaisons deux à deux sur tout le lot. Chaque candidat
+    est ensuite vérifié exactement avec similarite_paraphrase.
+
+    Renvoie une liste de groupes {"representant": indice, "membres":
+    [(indice, similarité avec le représentant), ...]} ; le représentant est
+    la première affirmation du groupe dans l'ordre du lot.
+    Les signatures sont calculées par `nb_processus` processus.
+    """
+    seuil = SEUIL_SIMILARITE_LOT if seuil is None else seuil
+    seaux = {}
+    representants = {}
+    groupes = []
+
+    empreintes = executer_en_processus(
+        empreinte_affirmation,
+        [json.dumps(affirmation) for affirmation in affirmations],
+        nb_processus,
+    )
+
+    for indice, empreinte in enumerate(empreintes):
+        empreinte = json.loads(empreinte)
+        if "erreur" in empreinte:
+            # Affirmation non comparable : elle forme son propre groupe.
+            groupes.append({"representant": indice, "membres": [(indice, 1.0)]})
+            continue
+        mots = frozenset(empreinte["mots"])
+        signature = tuple(empreinte["signature"])
+        marqueurs = frozenset(empreinte["marqueurs"])
+        cles = [
+            (bande, signature[bande * MINHASH_LIGNES_PAR_BANDE:(bande + 1) * MINHASH_LIGNES_PAR_BANDE])
+            for bande in range(MINHASH_NB_BANDES)
+        ]
+
+        meilleur_groupe, meilleure_similarite = None, 0.0
+        candidats = set()
+        for cle in cles:
+            candidats.update(seaux.get(cle, ()))
+        for numero_groupe in candidats:
+            mots_rep, marqueurs_rep = representants[numero_groupe]
+            if marqueurs_rep != marqueurs:
+                continue
+            similarite = similarite_paraphrase(mots, mots_rep)
+            if similarite >= seuil and similarite > meilleure_similarite:
+                meilleur_groupe, meilleure_similarite = numero_groupe, similarite
+
+        if meilleur_groupe is not None:
+            groupes[meilleur_groupe]["membres"].append((indice, meilleure_similarite))
+            continue
+
+        numero_groupe = len(groupes)
+        groupes.append({"representant": indice, "membres": [(indice, 1.0)]})
+        representants[numero_groupe] = (mots, marqueurs)
+        for cle in cles:
+            seaux.setdefault(cle, []).append(numero_groupe)
+
+    return groupes
+
+
+def post_traiter_reponse(enregistrement):
+    """
+    Étape exécutable dans un processus du lot : lecture de la réponse,
+    fiabilité de chaque source et, si demandé, génération du PDF.
+    Entrée : JSON {"question", "reponse_brute", "format_json", "chemin_pdf"}.
+    Sortie : JSON {"reponse", "conclusion", "sources": [{"url", "fiable"}],
+    "pdf"}, plus "erreur" si l'appel à l'API a échoué. La conclusion vaut
+    None quand la réponse n'en donne pas de lisible : contrairement à
+    l'affichage, le lot ne la remplace pas par FAUX. Si le PDF ne peut pas
+    être écrit, "pdf" vaut None et "erreur_pdf" en donne la raison, sans
+    perdre la vérification elle-même.
+    """
+    donnees = json.loads(enregistrement)
+    if est_erreur_api(donnees["reponse_brute"]):
+        return json.dumps({
+            "reponse": donnees["reponse_brute"],
+            "conclusion": None,
+            "sources": [],
+            "pdf": None,
+            "erreur": donnees["reponse_brute"],
+        }, ensure_ascii=False)
+
+    reponse, analyse = mettre_en_forme_reponse(donnees["reponse_brute"], donnees["format_json"])
+
+    sortie = {
+        "reponse": reponse,
+        "conclusion": analyse["conclusion"],
+        "sources": [
+            {"url": url, "fiable": est_url_valide(url) and est_url_de_confiance(url)}
+            for url in analyse["urls"]
+        ],
+        "pdf": None,
+    }
+    if donnees.get("chemin_pdf"):
+        try:
+            generer_pdf(donnees["chemin_pdf"], donnees["question"], reponse)
+            sortie["pdf"] = donnees["chemin_pdf"]
+        except Exception as e:
+            sortie["erreur_pdf"] = str(e)
+
+    return json.dumps(sortie, ensure_ascii=False)
+
+
+def _sortie_en_erreur(enregistrement, message):
+    """
+    Sortie d'un enregistrement dont le traitement a échoué. La réponse brute
+    de l'API, si l'enregistrement en contient une, est conservée pour que
+    l'analyse déjà payée ne soit pas perdue.
+    """
+    sortie = {"erreur": message}
+    try:
+        donnees = json.loads(enregistrement)
+    except ValueError:
+        donnees = None
+    if isinstance(donnees, dict) and "reponse_brute" in donnees:
+        sortie["reponse"] = donnees["reponse_brute"]
+    return json.dumps(sortie, ensure_ascii=False)
+
+
+def _traiter_paquet(fonction, paquet):
+    """Applique une étape à un paquet d'enregistrements, dans un processus."""
+    sorties = []
+    for enregistrement in paquet:
+        try:
+            sorties.append(fonction(enregistrement))
+        except Exception as e:
+            sorties.append(_sortie_en_erreur(enregistrement, str(e)))
+    return sorties
+
+
+def executer_en_processus(fonction, enregistrements, nb_processus=None,
+                          taille_paquet=16, tentatives_max=2):
+    """
+    Applique `fonction` (chaîne JSON -> chaîne JSON) à chaque enregistrement
+    dans un pool de processus, par paquets, et renvoie les sorties dans l'ordre.
+
+    Si un processus meurt, le pool est recréé et les paquets perdus sont
+    relancés ; après `tentatives_max` échecs, les enregistrements restants
+    sont repris un par un, et seul celui qui fait encore tomber son processus
+    reçoit une sortie {"erreur": ...}. Le reste du lot n'est pas perdu.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
+
+    nb_processus = NB_PROCESSUS_LOT if nb_processus is None else nb_processus
+    if nb_processus <= 1 or len(enregistrements) <= taille_paquet:
+        return _traiter_paquet(fonction, enregistrements)
+
+    sorties = [None] * len(enregistrements)
+    restants = {
+        debut: enregistrements[debut:debut + taille_paquet]
+        for debut in range(0, len(enregistrements), taille_paquet)
+    }
+
+    for _tentative in range(tentatives_max):
+        if not restants:
+            break
+        with ProcessPoolExecutor(max_workers=nb_processus) as pool:
+            travaux = {
+                pool.submit(_traiter_paquet, fonction, paquet): debut
+                for debut, paquet in restants.items()
+            }
+            for travail in as_completed(travaux):
+                debut = travaux[travail]
+                try:
+                    resultat = travail.result()
+                except BrokenProcessPool:
+                    continue
+                sorties[debut:debut + len(resultat)] = resultat
+                del restants[debut]
+
+    for debut, paquet in restants.items():
+        for decalage, enregistrement in enumerate(paquet):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                try:
+                    sortie = pool.submit(_traiter_paquet, fonction, [enregistrement]).result()[0]
+                except BrokenProcessPool:
+                    sortie = _sortie_en_erreur(enregistrement, "processus interrompu")
+            sorties[debut + decalage] = sortie
+
+    return sorties
+
+
+def verifier_affirmations(affirmations, indices, nb_processus=None, dossier_pdf=None):
+    """
+    Vérifie chacune des affirmations `indices` : appels réseau en parallèle
+    par NB_REQUETES_SIMULTANEES fils, post-traitement par `nb_processus`
+    processus. Renvoie, pour chaque indice, (sortie de post_traiter_reponse
+    décodée, mesures de l'appel).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    mesures = [{} for _indice in indices]
+
+    with ThreadPoolExecutor(max_workers=NB_REQUETES_SIMULTANEES) as fils:
+        reponses = list(fils.map(
+            lambda indice, mesure: demander_reponse_brute(affirmations[indice], mesure),
+            indices,
+            mesures,
+        ))
+
+    enregistrements = []
+    for indice, (reponse, format_json) in zip(indices, reponses):
+        chemin_pdf = None
+        if dossier_pdf:
+            chemin_pdf = os.path.join(dossier_pdf, f"verification_{indice + 1:04d}.pdf")
+        enregistrements.append(json.dumps({
+            "question": affirmations[indice],
+            "reponse_brute": reponse,
+            "format_json": format_json,
+            "chemin_pdf": chemin_pdf,
+        }, ensure_ascii=False))
+
+    sorties = executer_en_processus(post_traiter_reponse, enregistrements, nb_processus)
+
+    verifications = []
+    for sortie, mesure in zip(sorties, mesures):
+        sortie = json.loads(sortie)
+        # Une sortie en erreur n'a pas toutes les clés d'une sortie normale.
+        sortie.setdefault("reponse", None)
+        sortie.setdefault("conclusion", None)
+        sortie.setdefault("sources", [])
+        sortie.setdefault("pdf", None)
+        if "erreur" not in sortie:
+            noter_conclusion_niveau(mesure.get("niveau"), sortie["conclusion"])
+        verifications.append((sortie, mesure))
+    return verifications
+
+
+def verifier_lot(affirmations, seuil=None, nb_processus=None, dossier_pdf=None):
+    """
+    Vérifie une liste d'affirmations en n'interrogeant Tavily et Mistral
+    qu'une fois par groupe de paraphrases. Renvoie un résultat par
+    affirmation, dans l'ordre du lot, avec la conclusion du représentant
+    et la similarité de l'affirmation avec celui-ci.
+
+    Si le représentant n'obtient pas de conclusion (erreur d'API, réponse
+    illisible), les autres membres du groupe sont vérifiés chacun de leur
+    côté au lieu d'hériter d'un verdict manquant. Avec `dossier_pdf`, un
+    PDF est écrit par affirmation vérifiée. Chaque affirmation est inscrite
+    au registre, en une transaction par TAILLE_LOT_REGISTRE lignes.
+    """
+    groupes = regrouper_affirmations(affirmations, seuil, nb_processus)
+    representants = [groupe["representant"] for groupe in groupes]
+    verifications = dict(zip(
+        representants,
+        verifier_affirmations(affirmations, representants, nb_processus, dossier_pdf),
+    ))
+
+    # Pour chaque affirmation : (indice de l'affirmation vérifiée, similarité)
+    origines = [None] * len(affirmations)
+    a_reverifier = []
+    for groupe in groupes:
+        representant = groupe["representant"]
+        sortie, _mesure = verifications[representant]
+
+        for indice, similarite in groupe["membres"]:
+            if indice != representant and sortie["conclusion"] is None:
+                a_reverifier.append(indice)
+            else:
+                origines[indice] = (representant, similarite)
+
+    verifications.update(zip(
+        a_reverifier,
+        verifier_affirmations(affirmations, a_reverifier, nb_processus, dossier_pdf),
+    ))
+    for indice in a_reverifier:
+        origines[indice] = (indice, 1.0)
+
+    resultats = []
+    for indice, (verifiee, similarite) in enumerate(origines):
+        sortie, mesure = verifications[verifiee]
+        resultat = {
+            "affirmation": affirmations[indice],
+            "representant": affirmations[verifiee],
+            "similarite": round(similarite, 3),
+        }
+        resultat.update((cle, valeur) for cle, valeur in sortie.items() if cle != "reponse")
+        resultats.append(resultat)
+
+        if verifiee == indice:
+            enregistrer_verification(
+                affirmations[indice], sortie["conclusion"], sortie["reponse"],
+                sortie["sources"], mesure, sortie.get("erreur"),
+            )
+        else:
+            # Verdict repris du représentant : ni réponse, ni modèle, ni
+            # durées propres à cette affirmation.
+            enregistrer_verification(
+                affirmations[indice], sortie["conclusion"], None, sortie["sources"],
+                erreur=sortie.get("erreur"), herite_de=affirmations[verifiee],
+            )
+
+    vider_registre()
+    return resultats
+
+# ==============================
+# 5. REGISTRE DES VÉRIFICATIONS (SQLITE)
+# ==============================
+
+SCHEMA_REGISTRE = """
+CREATE TABLE IF NOT EXISTS verifications (
+    id INTEGER PRIMARY KEY,
+    horodatage REAL NOT NULL,
+    question TEXT NOT NULL,
+    conclusion TEXT,
+    reponse TEXT,
+    modele TEXT,
+    duree_recherche REAL,
+    duree_analyse REAL,
+    erreur TEXT,
+    herite_de TEXT
+);
+CREATE INDEX IF NOT EXISTS verifications_par_date ON verifications (horodatage);
+
+CREATE TABLE IF NOT EXISTS sources (
+    verification_id INTEGER NOT NULL REFERENCES verifications (id),
+    url TEXT NOT NULL,
+    domaine TEXT NOT NULL,
+    domaine_inverse TEXT NOT NULL,
+    fiable INTEGER NOT NULL,
+    accessible INTEGER
+);
+CREATE INDEX IF NOT EXISTS sources_par_domaine ON sources (domaine_inverse, verification_id);
+"""
+
+# Index plein texte tenu à jour par déclencheur
+SCHEMA_REGISTRE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS verifications_fts USING fts5 (
+    question, reponse, content='verifications', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS verifications_fts_ajout AFTER INSERT ON verifications BEGIN
+    INSERT INTO verifications_fts (rowid, question, reponse)
+    VALUES (new.id, new.question, new.reponse);
+END;
+"""
+
+registre = None
+registre_fts = False
+registre_en_attente = []
+verrou_registre = threading.Lock()
+
+
+def obtenir_registre():
+    """Ouvre (et crée si besoin) la base du registre au premier appel."""
+    global registre, registre_fts
+    if registre is None:
+        connexion = sqlite3.connect(CHEMIN_REGISTRE, check_same_thread=False)
+        connexion.row_factory = sqlite3.Row
+        connexion.execute("PRAGMA journal_mode=WAL")
+        # En WAL, NORMAL ne synchronise le disque qu'aux points de contrôle.
+        connexion.execute("PRAGMA synchronous=NORMAL")
+        connexion.executescript(SCHEMA_REGISTRE)
+        colonnes = {ligne["name"] for ligne in connexion.execute("PRAGMA table_info(verifications)")}
+        for colonne in ("erreur", "herite_de"):
+            if colonne not in colonnes:
+                # Registre créé avant l'ajout de la colonne
+                connexion.execute(f"ALTER TABLE verifications ADD COLUMN {colonne} TEXT")
+        try:
+            connexion.executescript(SCHEMA_REGISTRE_FTS)
+            registre_fts = True
+        except sqlite3.OperationalError:
+            # SQLite compilé sans FTS5 : la recherche se fera par LIKE.
+            registre_fts = False
+        registre = connexion
+        atexit.register(vider_registre)
+    return registre
+
+
+def inverser_domaine(domaine):
+    """« fr.wikipedia.org » -> « org.wikipedia.fr. », pour indexer les sous-domaines."""
+    return ".".join(reversed(domaine.split("."))) + "."
+
+
+def domaine_url(url):
+    domaine = (urlparse(url).hostname or "").lower()
+    if domaine.startswith("www."):
+        domaine = domaine[4:]
+    return domaine
+
+
+def enregistrer_verification(question, conclusion, reponse, sources, mesures=None,
+                             erreur=None, herite_de=None):
+    """
+    Ajoute une vérification au registre. `conclusion` vaut "VRAI", "FAUX" ou
+    None si la réponse n'en donne pas de lisible ; `erreur` contient le
+    message d'une erreur d'API. `sources` est une liste de dictionnaires
+    {"url", "fiable", "accessible" (facultatif)}. `herite_de` est la
+    question dont la vérification a été reprise, pour une paraphrase d'un
+    lot qui n'a pas été vérifiée elle-même. L'écriture est différée
+    jusqu'à TAILLE_LOT_REGISTRE vérifications ou vider_registre().
+    """
+    mesures = mesures or {}
+    ligne = (
+        time.time(), question, conclusion, reponse, mesures.get("modele"),
+        mesures.get("duree_recherche"), mesures.get("duree_analyse"), erreur, herite_de,
+        [(s["url"], s["fiable"], s.get("accessible")) for s in sources],
+    )
+    with verrou_registre:
+        registre_en_attente.append(ligne)
+        plein = len(registre_en_attente) >= TAILLE_LOT_REGISTRE
+    if plein:
+        vider_registre()
+
+
+def vider_registre():
+    """Écrit les vérifications en attente dans une seule transaction."""
+    with verrou_registre:
+        if not registre_en_attente:
+            return
+        lignes = registre_en_attente[:]
+        del registre_en_attente[:]
+
+        connexion = obtenir_registre()
+        with connexion:
+            for ligne in lignes:
+                *colonnes, sources = ligne
+                curseur = connexion.execute(
+                    "INSERT INTO verifications (horodatage, question, conclusion, reponse, modele, "
+                    "duree_recherche, duree_analyse, erreur, herite_de) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    colonnes,
+                )
+                connexion.executemany(
+                    "INSERT INTO sources (verification_id, url, domaine, domaine_inverse, "
+                    "fiable, accessible) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (curseur.lastrowid, url, domaine_url(url), inverser_domaine(domaine_url(url)),
+                         int(bool(fiable)), None if accessible is None else int(accessible))
+                        for url, fiable, accessible in sources
+                    ],
+                )
+
+
+def verifications_citant_domaine(domaine):
+    """Vérifications citant une URL du domaine ou d'un de ses sous-domaines."""
+    vider_registre()
+    prefixe = inverser_domaine(domaine.lower().removeprefix("www."))
+    # Le caractère qui suit « . » est « / » : [prefixe, prefixe-sans-point + "/")
+    # couvre le domaine et tous ses sous-domaines, via l'index.
+    lignes = obtenir_registre().execute(
+        "SELECT DISTINCT v.* FROM sources s JOIN verifications v ON v.id = s.verification_id "
+        "WHERE s.domaine_inverse >= ? AND s.domaine_inverse < ? ORDER BY v.horodatage",
+        (prefixe, prefixe[:-1] + "/"),
+    )
+    return [dict(ligne) for ligne in lignes]
+
+
+def requete_fts(texte):
+    """
+    Transforme un texte libre en requête FTS5 : chaque mot devient une chaîne
+    entre guillemets, pour que « l'ONU » ou « Est-ce » ne soient pas lus
+    comme de la syntaxe FTS5. Les mots doivent tous être présents.
+    """
+    return " ".join('"' + mot.replace('"', '""') + '"' for mot in texte.split())
+
+
+def rechercher_dans_verifications(texte, limite=50):
+    """Recherche plein texte dans les questions et les réponses enregistrées."""
+    vider_registre()
+    connexion = obtenir_registre()
+    requete = requete_fts(texte)
+    if not requete:
+        return []
+    if registre_fts:
+        lignes = connexion.execute(
+            "SELECT v.* FROM verifications_fts JOIN verifications v ON v.id = verifications_fts.rowid "
+            "WHERE verifications_fts MATCH ? ORDER BY rank LIMIT ?",
+            (requete, limite),
+        )
+    else:
+        motif = f"%{texte}%"
+        lignes = connexion.execute(
+            "SELECT * FROM verifications WHERE question LIKE ? OR reponse LIKE ? "
+            "ORDER BY horodatage DESC LIMIT ?",
+            (motif, motif, limite),
+        )
+    return [dict(ligne) for ligne in lignes]
+
+
+def verifications_entre(debut, fin=None):
+    """Vérifications dont la date (datetime) est dans [debut, fin)."""
+    vider_registre()
+    fin = fin or datetime.now()
+    lignes = obtenir_registre().execute(
+        "SELECT * FROM verifications WHERE horodatage >= ? AND horodatage < ? ORDER BY horodatage",
+        (debut.timestamp(), fin.timestamp()),
+    )
+    return [dict(ligne) for ligne in lignes]
 
 # ==============================
 # FORMATAGE DU TEXTE DANS TKINTER
 # ==============================
 
-def formater_texte_widget(widget, texte):
+def formater_texte_widget(widget, texte, etats_sources=None):
+    """
+    Affiche la réponse formatée dans le widget. Si `etats_sources` est fourni
+    (dictionnaire url -> accessible), l'accessibilité des liens y est lue au
+    lieu d'être testée sur le réseau, et les nouveaux tests y sont enregistrés.
+    """
     widget.delete("1.0", tk.END)
     widget.config(state=tk.NORMAL)
 
@@ -216,11 +1395,11 @@ def formater_texte_widget(widget, texte):
             widget.insert(tk.END, "\n")
             continue
 
-        traiter_ligne_formatee(widget, ligne, motif_url, motif_gras)
+        traiter_ligne_formatee(widget, ligne, motif_url, motif_gras, etats_sources)
         widget.insert(tk.END, "\n")
 
 
-def traiter_ligne_formatee(widget, ligne, motif_url, motif_gras):
+def traiter_ligne_formatee(widget, ligne, motif_url, motif_gras, etats_sources=None):
     if "Résumé général" in ligne:
         def reduire_bloc_gras(correspondance):
             contenu = correspondance.group(1)
@@ -233,7 +1412,7 @@ def traiter_ligne_formatee(widget, ligne, motif_url, motif_gras):
     segments = motif_url.split(ligne)
     for segment in segments:
         if motif_url.match(segment):
-            formater_url(widget, segment)
+            formater_url(widget, segment, etats_sources)
         else:
             appliquer_texte_gras(widget, segment, motif_gras)
 
@@ -251,9 +1430,16 @@ def appliquer_texte_gras(widget, texte, motif_gras):
         i += 1
 
 
-def formater_url(widget, url):
+def formater_url(widget, url, etats_sources=None):
     if est_url_valide(url) and est_url_de_confiance(url):
-        if est_url_accessible(url):
+        if etats_sources is None:
+            accessible = est_url_accessible(url)
+        else:
+            if url not in etats_sources:
+                etats_sources[url] = est_url_accessible(url)
+            accessible = etats_sources[url]
+
+        if accessible:
             widget.insert(tk.END, "🔗 ", "emoji")
             widget.insert(tk.END, url, ("url", "clickable"))
         else:
@@ -263,6 +1449,73 @@ def formater_url(widget, url):
         widget.insert(tk.END, "⚠️ Source non fiable : ", "warning")
         widget.insert(tk.END, url, "warning_text")
 
+# ==============================
+# HISTORIQUE DES QUESTIONS
+# ==============================
+
+# Entrées récentes gardées en mémoire (id -> entrée), de la plus ancienne
+# à la plus récente ; les autres sont compressées dans `dossier_historique`.
+historique_memoire = OrderedDict()
+historique_index = []
+dossier_historique = None
+
+
+def chemin_entree_historique(identifiant):
+    """Renvoie le chemin du fichier compressé d'une entrée d'historique."""
+    global dossier_historique
+    if dossier_historique is None:
+        dossier_historique = tempfile.mkdtemp(prefix="assistant_web_ia_")
+        atexit.register(shutil.rmtree, dossier_historique, True)
+    return os.path.join(dossier_historique, f"{identifiant}.json.gz")
+
+
+def ajouter_historique(question, reponse, etats_sources, analyse=None):
+    """
+    Enregistre une réponse dans l'historique : la réponse brute, son analyse
+    structurée et l'état des sources déjà testées, pour pouvoir la réafficher
+    sans réseau.
+    """
+    identifiant = len(historique_index)
+    historique_index.append((identifiant, question))
+    historique_memoire[identifiant] = {
+        "question": question,
+        "reponse": reponse,
+        "sources": dict(etats_sources),
+        "analyse": analyse,
+    }
+
+    while len(historique_memoire) > HISTORIQUE_MAX_EN_MEMOIRE:
+        ancien_id, ancienne_entree = historique_memoire.popitem(last=False)
+        with gzip.open(chemin_entree_historique(ancien_id), "wt", encoding="utf-8") as f:
+            json.dump(ancienne_entree, f, ensure_ascii=False)
+
+    return identifiant
+
+
+def charger_historique(identifiant):
+    """Renvoie une entrée de l'historique, depuis la mémoire ou le disque."""
+    entree = historique_memoire.get(identifiant)
+    if entree is not None:
+        historique_memoire.move_to_end(identifiant)
+        return entree
+
+    with gzip.open(chemin_entree_historique(identifiant), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def lors_selection_historique(evenement=None):
+    selection = liste_historique.curselection()
+    if not selection:
+        return
+
+    # La liste affiche les questions de la plus récente à la plus ancienne.
+    identifiant = historique_index[len(historique_index) - 1 - selection[0]][0]
+    entree = charger_historique(identifiant)
+
+    champ_question.delete(0, tk.END)
+    champ_question.insert(0, entree["question"])
+    formater_texte_widget(zone_sortie, entree["reponse"], entree["sources"])
+
 # ==============================
 # GESTION DU CLIC SUR LES LIENS
 # ==============================
@@ -322,6 +1575,23 @@ def exporter_pdf():
     if not chemin_fichier:
         return
 
+    question = champ_question.get().strip()
+    generer_pdf(chemin_fichier, question, contenu)
+
+    messagebox.showinfo("Succès", "Fichier PDF sauvegardé avec succès !")
+
+
+def generer_pdf(chemin_fichier, question, contenu):
+    """
+    Écrit le PDF d'une réponse. N'utilise pas l'interface : la fonction est
+    aussi appelée depuis les processus de la vérification par lot.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
     doc = SimpleDocTemplate(
         chemin_fichier,
         pagesize=A4,
@@ -370,7 +1640,6 @@ def exporter_pdf():
     histoire.append(Paragraph(texte_titre, style_titre))
     histoire.append(Spacer(1, 0.2*inch))
 
-    question = champ_question.get().strip()
     en_tete_question = Paragraph("❯ QUESTION POSÉE :", style_section)
     histoire.append(en_tete_question)
 
@@ -478,8 +1747,6 @@ def exporter_pdf():
 
     doc.build(histoire)
 
-    messagebox.showinfo("Succès", "Fichier PDF sauvegardé avec succès !")
-
 # ==============================
 # ENVOI DE LA QUESTION
 # ==============================
@@ -502,23 +1769,37 @@ def lors_envoi_question():
     zone_sortie.insert(tk.END, "🔄 Recherche en cours...\n", "loading")
     zone_sortie.update()
 
-    reponse = demander_analyse_mistral(question)
+    mesures = {}
+    reponse, analyse = analyser_question(question, mesures)
+    noter_conclusion_niveau(mesures.get("niveau"), analyse["conclusion"])
 
-    if "Conclusion" in reponse:
-        parties = reponse.split("Conclusion")
-        corps = "Conclusion".join(parties[:-1])
-        derniere = parties[-1]
+    etats_sources = {}
+    formater_texte_widget(zone_sortie, reponse, etats_sources)
 
-        if "VRAI" in derniere.upper():
-            conclusion = "Conclusion : VRAI"
-        elif "FAUX" in derniere.upper():
-            conclusion = "Conclusion : FAUX"
-        else:
-            conclusion = "Conclusion : FAUX"
+    ajouter_historique(question, reponse, etats_sources, analyse)
+    enregistrer_sources_affichees(question, reponse, analyse, etats_sources, mesures)
+    liste_historique.insert(0, question)
 
-        reponse = corps.strip() + "\n" + conclusion
 
-    formater_texte_widget(zone_sortie, reponse)
+def enregistrer_sources_affichees(question, reponse, analyse, etats_sources, mesures):
+    """Inscrit au registre la réponse affichée, avec l'accessibilité testée des liens."""
+    accessibilites = {url.rstrip(".,;:*)"): accessible for url, accessible in etats_sources.items()}
+    sources = [
+        {
+            "url": url,
+            "fiable": est_url_valide(url) and est_url_de_confiance(url),
+            "accessible": accessibilites.get(url),
+        }
+        for url in analyse["urls"]
+    ]
+    try:
+        enregistrer_verification(
+            question, analyse["conclusion"], reponse, sources, mesures,
+            reponse if est_erreur_api(reponse) else None,
+        )
+        vider_registre()
+    except sqlite3.Error as e:
+        messagebox.showwarning("Registre", f"Vérification non enregistrée : {e}")
 
 # ==============================
 # INTERFACE PRINCIPALE
@@ -655,6 +1936,35 @@ def creer_interface_principale():
     )
     etiquette_pied.pack(side=tk.BOTTOM, pady=20)
 
+    # Historique
+    separateur3 = tk.Frame(barre_laterale, bg="#2F4558", height=2)
+    separateur3.pack(fill=tk.X, padx=20, pady=20)
+
+    etiquette_historique = tk.Label(
+        barre_laterale,
+        text="🕘 Historique",
+        font=("Arial", 12, "bold"),
+        bg="#161f2b",
+        fg="#FFFFFF"
+    )
+    etiquette_historique.pack(pady=(0, 10))
+
+    liste_historique_local = tk.Listbox(
+        barre_laterale,
+        font=("Arial", 10),
+        bg="#2F4558",
+        fg="#FFFFFF",
+        selectbackground="#55D5E0",
+        selectforeground="#1a2633",
+        activestyle="none",
+        exportselection=False,
+        relief=tk.FLAT,
+        bd=0,
+        highlightthickness=0
+    )
+    liste_historique_local.pack(fill=tk.BOTH, expand=True, padx=20)
+    liste_historique_local.bind("<<ListboxSelect>>", lors_selection_historique)
+
     # Zone principale
     zone_principale = tk.Frame(application, bg="#1a2633")
     zone_principale.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -768,6 +2078,7 @@ def creer_interface_principale():
 
     globals()["champ_question"] = champ_question_local
     globals()["zone_sortie"] = zone_sortie_local
+    globals()["liste_historique"] = liste_historique_local
 
     # Styles de texte
     try:
@@ -798,11 +2109,186 @@ def creer_interface_principale():
 
     champ_question_local.bind("<Return>", lambda e: lors_envoi_question())
 
+    # Les bibliothèques réseau se chargent en arrière-plan une fois la
+    # fenêtre affichée, pour que la première recherche ne les attende pas.
+    application.after(200, lambda: threading.Thread(
+        target=precharger_modules_reseau, daemon=True
+    ).start())
+
     application.mainloop()
 
+# ==============================
+# DÉMARRAGE ET MODES SANS INTERFACE
+# ==============================
+
+def precharger_modules_reseau():
+    try:
+        import requests  # noqa: F401
+        obtenir_client_tavily()
+    except Exception:
+        # L'erreur réapparaîtra, avec un message, lors de la recherche.
+        pass
+
+
+def mesurer_temps_import(chemin_module=None):
+    """
+    Importe ce module dans un interpréteur neuf lancé avec `-X importtime`.
+    Renvoie la durée totale d'import (en microsecondes) et la liste des
+    modules de MODULES_CHARGES_A_LA_DEMANDE chargés malgré tout.
+    """
+    chemin_module = chemin_module or os.path.abspath(__file__)
+    instructions = (
+        "import importlib.util; "
+        f"spec = importlib.util.spec_from_file_location('assistant_web_ia', {chemin_module!r}); "
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+    )
+    resultat = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", instructions],
+        capture_output=True,
+        text=True,
+    )
+    if resultat.returncode != 0:
+        raise RuntimeError(resultat.stderr.strip().splitlines()[-1])
+
+    duree_totale = 0
+    modules_lourds = []
+    for ligne in resultat.stderr.splitlines():
+        if not ligne.startswith("import time:"):
+            continue
+        colonnes = ligne[len("import time:"):].split("|")
+        if len(colonnes) != 3 or not colonnes[0].strip().isdigit():
+            continue
+        duree_totale += int(colonnes[0])
+        nom = colonnes[2].strip()
+        if nom.split(".")[0] in MODULES_CHARGES_A_LA_DEMANDE:
+            modules_lourds.append(nom)
+    return duree_totale, modules_lourds
+
+
+def afficher_mesure_import():
+    duree_totale, modules_lourds = mesurer_temps_import()
+    print(f"Temps d'import : {duree_totale / 1000:.1f} ms")
+    if modules_lourds:
+        print("Modules chargés trop tôt : " + ", ".join(modules_lourds))
+        return 1
+    return 0
+
+
+def executer_lot(chemin_lot, chemin_sortie=None, nb_processus=None, dossier_pdf=None):
+    """
+    Vérifie les affirmations d'un fichier texte (une par ligne) et écrit un
+    résultat JSON par ligne dans `chemin_sortie`, ou sur la sortie standard.
+    """
+    with open(chemin_lot, encoding="utf-8") as f:
+        affirmations = [ligne.strip() for ligne in f if ligne.strip()]
+
+    if dossier_pdf:
+        os.makedirs(dossier_pdf, exist_ok=True)
+
+    resultats = verifier_lot(affirmations, nb_processus=nb_processus, dossier_pdf=dossier_pdf)
+    print(
+        "Statistiques par niveau de modèle : "
+        + json.dumps(resumer_statistiques_niveaux(), ensure_ascii=False),
+        file=sys.stderr,
+    )
+
+    sortie = open(chemin_sortie, "w", encoding="utf-8") if chemin_sortie else sys.stdout
+    try:
+        for resultat in resultats:
+            sortie.write(json.dumps(resultat, ensure_ascii=False) + "\n")
+    finally:
+        if chemin_sortie:
+            sortie.close()
+    return 0
+
+
+def interroger_registre(arguments):
+    """Affiche en JSON Lines les vérifications du registre demandées."""
+    if arguments.domaine:
+        lignes = verifications_citant_domaine(arguments.domaine)
+    elif arguments.chercher:
+        lignes = rechercher_dans_verifications(arguments.chercher)
+    else:
+        debut = datetime.fromisoformat(arguments.depuis)
+        fin = datetime.fromisoformat(arguments.jusqu_a) if arguments.jusqu_a else None
+        lignes = verifications_entre(debut, fin)
+
+    for ligne in lignes:
+        print(json.dumps(ligne, ensure_ascii=False))
+    return 0
+
+
+def lire_arguments():
+    analyseur = argparse.ArgumentParser(description="Assistant Web IA")
+    analyseur.add_argument(
+        "--lot",
+        metavar="FICHIER",
+        help="vérifie sans interface les affirmations du fichier (une par "
+             "ligne), en regroupant les paraphrases",
+    )
+    analyseur.add_argument(
+        "--sortie",
+        metavar="FICHIER",
+        help="fichier JSON Lines des résultats du lot (sortie standard par défaut)",
+    )
+    analyseur.add_argument(
+        "--processus",
+        type=int,
+        metavar="N",
+        help=f"nombre de processus du post-traitement du lot (défaut : {NB_PROCESSUS_LOT}, 1 pour tout faire dans ce processus)",
+    )
+    analyseur.add_argument(
+        "--pdf",
+        metavar="DOSSIER",
+        help="écrit aussi un PDF par affirmation vérifiée du lot dans ce dossier",
+    )
+    analyseur.add_argument(
+        "--domaine",
+        help="affiche les vérifications du registre citant ce domaine (ou un sous-domaine)",
+    )
+    analyseur.add_argument(
+        "--chercher",
+        metavar="TEXTE",
+        help="recherche plein texte (tous les mots) dans les questions et réponses du registre",
+    )
+    analyseur.add_argument(
+        "--depuis",
+        metavar="DATE",
+        help="affiche les vérifications du registre depuis cette date (ISO, ex : 2025-01-31)",
+    )
+    analyseur.add_argument(
+        "--jusqu-a",
+        metavar="DATE",
+        help="avec --depuis, date de fin exclue (ISO)",
+    )
+    analyseur.add_argument(
+        "--mesurer-import",
+        action="store_true",
+        help="mesure le temps d'import du module (-X importtime) et échoue "
+             "si requests, tavily ou reportlab sont chargés à l'import",
+    )
+    arguments = analyseur.parse_args()
+
+    if arguments.jusqu_a and not arguments.depuis:
+        analyseur.error("--jusqu-a s'utilise avec --depuis")
+    for option, valeur in (("--depuis", arguments.depuis), ("--jusqu-a", arguments.jusqu_a)):
+        if valeur:
+            try:
+                datetime.fromisoformat(valeur)
+            except ValueError:
+                analyseur.error(f"{option} : date ISO invalide ({valeur})")
+    return arguments
+
 # ==============================
 # POINT D'ENTRÉE
 # ==============================
 
 if __name__ == "__main__":
+    arguments = lire_arguments()
+    if arguments.mesurer_import:
+        sys.exit(afficher_mesure_import())
+    if arguments.lot:
+        sys.exit(executer_lot(arguments.lot, arguments.sortie, arguments.processus, arguments.pdf))
+    if arguments.domaine or arguments.chercher or arguments.depuis:
+        sys.exit(interroger_registre(arguments))
     creer_interface_principale()